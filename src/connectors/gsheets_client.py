@@ -1,90 +1,468 @@
 import os
+import atexit
+import fcntl
 import gspread
+import json
 import logging
-import pytz
-from datetime import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
-from oauth2client.service_account import ServiceAccountCredentials
+from google.auth.transport.requests import Request
+from google.oauth2.service_account import Credentials
+from ratelimit import limits, sleep_and_retry
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from connectors.sqlite_store import AttendanceStore
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+COLOMBIA_TZ = ZoneInfo("America/Bogota")
+
+# Shift name for each hour of the day: before noon is morning
+_SHIFT_BY_HOUR = ("Jornada Mañana",) * 12 + ("Jornada Tarde",) * 12
+
+# Access tokens are shared between worker processes through this file
+DEFAULT_TOKEN_CACHE_PATH = "/tmp/gsheets_token.json"
+# Cached tokens closer than this to expiry are not reused
+TOKEN_EXPIRY_MARGIN = timedelta(minutes=5)
+
+# Local SQLite store used as the source of truth for check-ins. It holds
+# arrivals not yet synced to Sheets, so ATTENDANCE_DB_PATH must point at
+# persistent storage in deployments (the Docker image uses /data)
+DEFAULT_DB_PATH = "attendance.db"
+
+# Google Sheets scope
+SCOPE = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/drive"
+]
+
+# Seconds before the local roster is re-synced from Sheets
+INDEX_TTL_SECONDS = 60
+# Minimum index age before an unknown id_number triggers a refresh
+MISS_REFRESH_COOLDOWN_SECONDS = 10
+# Seconds to wait after a failed refresh or connection before trying Sheets again
+REFRESH_RETRY_SECONDS = 30
+
+# Positional columns in the attendees worksheet (0-based)
+ID_NUMBER_COL = 0
+# Legacy comma-separated arrival history, no longer written by this app
+ARRIVAL_TIME_COL = 4
+
+# Header of the append-only arrivals log worksheet
+LOG_HEADER = ["id_number", "timestamp", "shift"]
+
+# Settings for the worker that syncs the outbox to the log worksheet
+FLUSH_BATCH_SIZE = 100
+FLUSH_INTERVAL_SECONDS = 0.5
+FLUSH_RETRY_SECONDS = 5
+
+# Connection pool shared by every Sheets request made through the client
+HTTP_POOL_CONNECTIONS = 10
+HTTP_POOL_MAXSIZE = 50
+# One retry per call; once it is spent the last 5xx response is returned so
+# gspread raises its usual APIError instead of requests' RetryError
+HTTP_RETRY = Retry(
+    total=1,
+    backoff_factor=0.3,
+    status_forcelist=[500, 502, 503, 504],
+    raise_on_status=False
+)
+
+# Client-side budget for Sheets API calls, kept under the 500 req / 100 s
+# project quota. The limit applies per worker process and counts logical
+# calls: with HTTP_RETRY a call can send up to 1 + HTTP_RETRY.total requests
+SHEETS_CALLS_PER_PERIOD = 90
+SHEETS_PERIOD_SECONDS = 100
+
+# One authorized client per process, shared by every AttendanceManager
+_client: gspread.Client | None = None
+_client_lock = threading.Lock()
+
+
+@sleep_and_retry
+@limits(calls=SHEETS_CALLS_PER_PERIOD, period=SHEETS_PERIOD_SECONDS)
+def _sheets_call(fn, *args, **kwargs):
+    """Invoke a Sheets API call, waiting for a free slot instead of tripping the quota."""
+    return fn(*args, **kwargs)
+
+
+def _format_timestamp(dt: datetime) -> str:
+    """Format dt as YYYY-MM-DD HH:MM:SS without going through strftime."""
+    return (
+        f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d} "
+        f"{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}"
+    )
+
+
+def _read_cached_token(path: str, credentials: Credentials) -> tuple[str, datetime] | None:
+    """
+    Return (token, expiry) from the cache file if it is still usable.
+    Tokens issued to a different service account or scope set are ignored.
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        if (
+            data["service_account_email"] != credentials.service_account_email
+            or data["scopes"] != sorted(credentials.scopes)
+        ):
+            return None
+        token = data["token"]
+        # google-auth compares expiry as a naive UTC datetime
+        expiry = datetime.fromtimestamp(data["exp"], tz=timezone.utc).replace(tzinfo=None)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+    if expiry - datetime.now(timezone.utc).replace(tzinfo=None) < TOKEN_EXPIRY_MARGIN:
+        return None
+    return (token, expiry)
+
+
+def _write_cached_token(path: str, credentials: Credentials) -> None:
+    """
+    Atomically write the credentials' access token and expiry to the cache file.
+    The temp file is created with O_EXCL so a pre-planted file or symlink at
+    its predictable name in a shared directory is never written through.
+    """
+    exp = credentials.expiry.replace(tzinfo=timezone.utc).timestamp()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        # Left over from a crashed write by a process with the same pid
+        os.unlink(tmp_path)
+    except FileNotFoundError:
+        pass
+
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({
+                "service_account_email": credentials.service_account_email,
+                "scopes": sorted(credentials.scopes),
+                "token": credentials.token,
+                "exp": exp
+            }, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def _load_credentials(creds_path: str, scope: list[str]) -> Credentials:
+    """
+    Load service account credentials, reusing a cached access token when possible.
+    The lock file ensures only one process performs the token exchange.
+    """
+    credentials = Credentials.from_service_account_file(creds_path, scopes=scope)
+    cache_path = os.getenv("GOOGLE_SHEETS_TOKEN_CACHE_PATH", DEFAULT_TOKEN_CACHE_PATH)
+
+    try:
+        with open(f"{cache_path}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            cached = _read_cached_token(cache_path, credentials)
+            if cached:
+                credentials.token, credentials.expiry = cached
+                logger.info("Reusing cached Google access token")
+            else:
+                credentials.refresh(Request())
+                _write_cached_token(cache_path, credentials)
+    except OSError as e:
+        # The cache is an optimization; google-auth refreshes the token on demand
+        logger.warning(f"Token cache unavailable at {cache_path}: {e}")
+
+    return credentials
+
+
+def _get_client(creds_path: str, scope: list[str]) -> gspread.Client:
+    """Return the process-wide gspread client, authorizing it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            client = gspread.authorize(_load_credentials(creds_path, scope))
+            # Keep TLS connections to Google alive and retry transient 5xx errors
+            client.http_client.session.mount("https://", HTTPAdapter(
+                pool_connections=HTTP_POOL_CONNECTIONS,
+                pool_maxsize=HTTP_POOL_MAXSIZE,
+                max_retries=HTTP_RETRY
+            ))
+            _client = client
+        return _client
+
 
 class AttendanceManager:
     def __init__(self):
-        """Initialize connection to Google Sheets for attendance control."""
+        """
+        Initialize attendance control backed by the local store.
+        When the store already has a roster, Google Sheets is connected in the
+        background so check-ins work even if Sheets is unreachable at startup.
+        """
         load_dotenv()
 
-        creds_path = os.getenv("GOOGLE_SHEETS_CREDENTIALS_PATH")
+        self._creds_path = os.getenv("GOOGLE_SHEETS_CREDENTIALS_PATH")
         
-        if not creds_path:
+        if not self._creds_path:
             msg = "Environment variable 'GOOGLE_SHEETS_CREDENTIALS_PATH' must be defined."
             logger.error(msg)
             raise ValueError(msg)
 
-        # Sheet and worksheet names
-        self.sheet_name = "Control de asistencia"
-        self.worksheet_name = "asistentes"
+        self.sheet_id = os.getenv("GOOGLE_SHEETS_ID")
+
+        if not self.sheet_id:
+            msg = "Environment variable 'GOOGLE_SHEETS_ID' must be defined."
+            logger.error(msg)
+            raise ValueError(msg)
 
-        # Google Sheets scope
-        scope = [
-            "https://spreadsheets.google.com/feeds",
-            "https://www.googleapis.com/auth/drive"
-        ]
+        # Worksheet names
+        self.worksheet_name = "asistentes"
+        self.log_worksheet_name = "asistentes_log"
+        # Range read on every index load: header plus columns A:E
+        self._roster_range = f"{self.worksheet_name}!A1:E"
 
-        # Authenticate
-        if not os.path.exists(creds_path):
-            msg = f"Credentials file not found at {creds_path}"
+        # Credentials are loaded when Sheets is first connected
+        if not os.path.exists(self._creds_path):
+            msg = f"Credentials file not found at {self._creds_path}"
             logger.error(msg)
             raise FileNotFoundError(msg)
-        
-        credentials = ServiceAccountCredentials.from_json_keyfile_name(creds_path, scope)
-        self.client = gspread.authorize(credentials)
 
-        # Open sheet and worksheet
+        # Sheets handles are opened lazily by _connect_sheets
+        self.client: gspread.Client | None = None
+        self.sheet: gspread.Spreadsheet | None = None
+        self.worksheet: gspread.Worksheet | None = None
+        self.log_worksheet: gspread.Worksheet | None = None
+        self._connect_lock = threading.Lock()
+        self._connect_failed_at: float | None = None
+
+        # Roster and pending arrivals live in SQLite; Sheets is synced in the background
+        self.store = AttendanceStore(os.getenv("ATTENDANCE_DB_PATH", DEFAULT_DB_PATH))
+        self._index_loaded_at: float = 0.0
+        self._refresh_failed_at: float | None = None
+
+        # A single-worker executor plus the scheduled flag keeps at most one
+        # refresh queued or running at a time
+        self._refresh_executor = ThreadPoolExecutor(max_workers=1)
+        self._refresh_scheduled = False
+        self._schedule_lock = threading.Lock()
+
+        if self.store.count_attendees():
+            # Serve the last synced roster right away; Sheets syncs in the background
+            logger.info("Using local roster, syncing with Google Sheets in the background")
+            self._schedule_refresh()
+        else:
+            # Nothing to serve yet, so the first sync has to succeed
+            self._load_index()
+
+        self._flusher = threading.Thread(
+            target=self._flush_loop, name="gsheets-flusher", daemon=True
+        )
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def _connect_sheets(self) -> bool:
+        """
+        Open the client, spreadsheet and worksheets if not connected yet.
+        Returns False if Sheets is unreachable; after a failure no new attempt
+        is made for REFRESH_RETRY_SECONDS.
+        """
+        with self._connect_lock:
+            if self.log_worksheet is not None:
+                return True
+
+            failed_at = self._connect_failed_at
+            if failed_at is not None and time.monotonic() - failed_at < REFRESH_RETRY_SECONDS:
+                return False
+
+            try:
+                self.client = _get_client(self._creds_path, SCOPE)
+                self.sheet = _sheets_call(self.client.open_by_key, self.sheet_id)
+                self.worksheet = _sheets_call(self.sheet.worksheet, self.worksheet_name)
+                self.log_worksheet = self._open_log_worksheet()
+            except Exception as e:
+                self._connect_failed_at = time.monotonic()
+                logger.error(f"Error opening sheet/worksheet: {e}")
+                return False
+
+            self._connect_failed_at = None
+            logger.info(f"Connected to '{self.sheet.title}' - '{self.worksheet_name}'")
+            return True
+
+    def _open_log_worksheet(self) -> gspread.Worksheet:
+        """Open the arrivals log worksheet, creating it on first use."""
+        try:
+            return _sheets_call(self.sheet.worksheet, self.log_worksheet_name)
+        except gspread.exceptions.WorksheetNotFound:
+            logger.info(f"Creating worksheet '{self.log_worksheet_name}'")
+            try:
+                log_worksheet = _sheets_call(
+                    self.sheet.add_worksheet,
+                    title=self.log_worksheet_name, rows=1, cols=len(LOG_HEADER)
+                )
+            except gspread.exceptions.APIError as e:
+                if e.response.status_code != 400:
+                    logger.error(f"Error creating worksheet '{self.log_worksheet_name}': {e}")
+                    raise
+                # Duplicate sheet name: another worker created it first; use theirs
+                logger.info(f"Worksheet '{self.log_worksheet_name}' already created, reopening")
+                return _sheets_call(self.sheet.worksheet, self.log_worksheet_name)
+            _sheets_call(log_worksheet.append_row, LOG_HEADER, value_input_option="RAW")
+            return log_worksheet
+
+    def _load_index(self) -> None:
+        """
+        Fetch columns A:E once and sync the roster into the local store.
+        Rows are parsed positionally instead of building a dict per record.
+        """
+        if not self._connect_sheets():
+            raise ConnectionError("Google Sheets is unavailable")
+
+        response = _sheets_call(
+            self.sheet.values_get,
+            self._roster_range,
+            params={"majorDimension": "ROWS"}
+        )
+        rows = response.get("values", [])
+        if not rows:
+            raise ValueError(f"Worksheet '{self.worksheet_name}' has no header row")
+
+        header = [str(col).strip() for col in rows[0]]
+        name_col = header.index("name") if "name" in header else 1
+
+        attendees = {}
+        for idx, row in enumerate(rows[1:]):
+            id_number = str(row[ID_NUMBER_COL]).strip() if row else ""
+            if not id_number:
+                continue
+            name = row[name_col] if len(row) > name_col else ""
+            arrivals = row[ARRIVAL_TIME_COL] if len(row) > ARRIVAL_TIME_COL else ""
+            if id_number in attendees:
+                # Match the original linear scan: the first row with an id wins
+                logger.warning(
+                    f"Duplicate id_number {id_number} at row {idx + 2}, "
+                    f"keeping row {attendees[id_number][1]}"
+                )
+                continue
+            # idx + 2 because: 1 for header, 1 for 0-indexing
+            attendees[id_number] = (id_number, idx + 2, name, str(arrivals).strip())
+
+        self.store.replace_roster(list(attendees.values()))
+        self._index_loaded_at = time.monotonic()
+        self._refresh_failed_at = None
+        logger.info(f"Synced {len(attendees)} attendees into local store")
+
+    def _refresh_index(self) -> None:
+        """
+        Reload the index on the refresh executor.
+        Requests keep serving the stale copy while this runs.
+        """
+        try:
+            self._load_index()
+        except Exception as e:
+            self._refresh_failed_at = time.monotonic()
+            logger.error(f"Error refreshing attendee index, serving stale copy: {e}")
+        finally:
+            with self._schedule_lock:
+                self._refresh_scheduled = False
+
+    def _schedule_refresh(self) -> None:
+        """Submit a background refresh unless one is already queued."""
+        with self._schedule_lock:
+            if self._refresh_scheduled:
+                return
+            self._refresh_scheduled = True
+        self._refresh_executor.submit(self._refresh_index)
+
+    def _index_age(self) -> float:
+        """Seconds since the index was last loaded."""
+        return time.monotonic() - self._index_loaded_at
+
+    def _refresh_due(self, found: bool) -> bool:
+        """
+        Check whether a lookup should trigger a background refresh.
+        After a failure, wait REFRESH_RETRY_SECONDS so an outage doesn't turn
+        every request into another fetch that eats the outbox's API budget.
+        """
+        failed_at = self._refresh_failed_at
+        if failed_at is not None and time.monotonic() - failed_at < REFRESH_RETRY_SECONDS:
+            return False
+
+        age = self._index_age()
+        return age > INDEX_TTL_SECONDS or (not found and age > MISS_REFRESH_COOLDOWN_SECONDS)
+
+    def _flush_loop(self) -> None:
+        """Periodically sync the outbox to the log worksheet."""
+        while True:
+            time.sleep(FLUSH_INTERVAL_SECONDS)
+            try:
+                if not self.flush():
+                    time.sleep(FLUSH_RETRY_SECONDS)
+            except Exception as e:
+                logger.error(f"Error flushing outbox: {e}")
+                time.sleep(FLUSH_RETRY_SECONDS)
+
+    def _write_batch(self, batch: list[list[str]]) -> bool:
+        """
+        Append a batch of [id_number, timestamp, shift] rows in one request.
+        Returns False if the write failed.
+        """
         try:
-            self.sheet = self.client.open(self.sheet_name)
-            self.worksheet = self.sheet.worksheet(self.worksheet_name)
-            logger.info(f"Connected to '{self.sheet_name}' - '{self.worksheet_name}'")
+            _sheets_call(self.log_worksheet.append_rows, batch, value_input_option="RAW")
         except Exception as e:
-            logger.error(f"Error opening sheet/worksheet: {e}")
-            raise
+            logger.error(f"Error appending {len(batch)} arrival rows: {e}")
+            return False
+
+        logger.info(f"Flushed {len(batch)} arrival rows")
+        return True
+
+    def flush(self) -> bool:
+        """
+        Append every pending outbox row to the log worksheet, in batches.
+        Returns False if Sheets is unavailable or a batch failed; unsent rows
+        stay in the outbox for a retry.
+        """
+        if not self._connect_sheets():
+            return False
+
+        while True:
+            claimed = self.store.claim_outbox(FLUSH_BATCH_SIZE)
+            if not claimed:
+                return True
+
+            outbox_ids = [outbox_id for outbox_id, _ in claimed]
+            if not self._write_batch([row for _, row in claimed]):
+                self.store.release_outbox(outbox_ids)
+                return False
+            self.store.complete_outbox(outbox_ids)
 
     def _get_colombia_timestamp(self) -> str:
         """Generate current timestamp in Colombia timezone."""
-        colombia_tz = pytz.timezone("America/Bogota")
-        now = datetime.now(colombia_tz)
-        return now.strftime("%Y-%m-%d %H:%M:%S")
+        return _format_timestamp(datetime.now(COLOMBIA_TZ))
     
     def _get_colombia_datetime(self) -> datetime:
         """Get current datetime in Colombia timezone."""
-        colombia_tz = pytz.timezone("America/Bogota")
-        return datetime.now(colombia_tz)
+        return datetime.now(COLOMBIA_TZ)
     
     def _determine_shift(self, timestamp_dt: datetime) -> str:
         """Determine if arrival is morning or afternoon shift."""
-        if timestamp_dt.hour < 12:
-            return "Jornada Mañana"
-        else:
-            return "Jornada Tarde"
+        return _SHIFT_BY_HOUR[timestamp_dt.hour]
 
     def _find_person_row(self, id_number: str) -> tuple:
         """
-        Find person by id_number and return (row_index, row_data).
+        Find person by id_number and return (row_index, name).
         Returns (None, None) if not found.
         """
-        try:
-            all_records = self.worksheet.get_all_records()
-            
-            for idx, record in enumerate(all_records):
-                if str(record.get("id_number", "")).strip() == str(id_number).strip():
-                    # idx + 2 because: 1 for header, 1 for 0-indexing
-                    return (idx + 2, record)
-            
-            return (None, None)
-        except Exception as e:
-            logger.error(f"Error searching for id_number {id_number}: {e}")
-            raise
+        row_index, name = self.store.find_attendee(str(id_number).strip())
+
+        # Refresh in the background so no request waits on the Sheets API.
+        # On a miss the person may have been added after the last load, so
+        # the next attempt will see the new row; the cooldown keeps typos and
+        # unknown ids from turning into a steady stream of full fetches.
+        if self._refresh_due(row_index is not None):
+            self._schedule_refresh()
+
+        return (row_index, name)
 
     def register_arrival(self, id_number: str) -> dict:
         """
@@ -94,7 +472,7 @@ class AttendanceManager:
             dict: Status message with result including shift (morning/afternoon)
         """
         try:
-            row_index, person_data = self._find_person_row(id_number)
+            row_index, name = self._find_person_row(id_number)
             
             if row_index is None:
                 logger.warning(f"ID {id_number} not found")
@@ -106,35 +484,24 @@ class AttendanceManager:
             
             # Get current datetime and timestamp
             current_dt = self._get_colombia_datetime()
-            new_timestamp = current_dt.strftime("%Y-%m-%d %H:%M:%S")
+            new_timestamp = _format_timestamp(current_dt)
             
             # Determine shift
             shift = self._determine_shift(current_dt)
             
-            # Get existing arrival times
-            current_arrival = person_data.get("arrival_time", "")
-            
-            # Build new arrival_time value
-            if current_arrival and str(current_arrival).strip():
-                # Append to existing timestamps (comma-separated list)
-                updated_arrival = f"{current_arrival}, {new_timestamp}"
-            else:
-                # First timestamp
-                updated_arrival = new_timestamp
-            
-            # Update the cell (column E is arrival_time, index 5)
-            self.worksheet.update_cell(row_index, 5, updated_arrival)
+            # Committed locally; the outbox worker appends it to the log worksheet
+            all_arrivals = self.store.record_arrival(str(id_number).strip(), new_timestamp, shift)
             
-            logger.info(f"Arrival registered for {person_data.get('name')} (ID: {id_number}) - {shift}")
+            logger.info(f"Arrival registered for {name} (ID: {id_number}) - {shift}")
             
             return {
                 "success": True,
                 "message": "Asistencia registrada exitosamente",
                 "id_number": id_number,
-                "name": person_data.get("name"),
+                "name": name,
                 "timestamp": new_timestamp,
                 "shift": shift,
-                "all_arrivals": updated_arrival
+                "all_arrivals": all_arrivals
             }
             
         except Exception as e:
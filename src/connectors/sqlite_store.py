@@ -0,0 +1,159 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Outbox rows claimed longer than this are assumed abandoned (e.g. a worker died)
+OUTBOX_CLAIM_TIMEOUT_SECONDS = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attendees (
+    id_number TEXT PRIMARY KEY,
+    row_index INTEGER NOT NULL,
+    name TEXT NOT NULL DEFAULT '',
+    arrivals TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_number TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    shift TEXT NOT NULL,
+    claimed_at REAL
+);
+"""
+
+
+class AttendanceStore:
+    def __init__(self, db_path: str):
+        """
+        Local SQLite store for the roster and pending arrivals.
+        Each thread gets its own connection; WAL lets readers and the
+        writer work concurrently across threads and worker processes.
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+
+        self._connection().executescript(SCHEMA)
+        logger.info(f"Attendance store ready at {self.db_path}")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Run the block inside a write transaction, rolling back on error."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def replace_roster(self, attendees: list[tuple[str, int, str, str]]) -> None:
+        """
+        Sync the roster from (id_number, row_index, name, sheet_arrivals) tuples.
+        sheet_arrivals seeds the local history the first time a person is seen;
+        after that, arrivals recorded locally are kept.
+        """
+        with self._transaction() as conn:
+            conn.executemany(
+                """
+                INSERT INTO attendees (id_number, row_index, name, arrivals) VALUES (?, ?, ?, ?)
+                ON CONFLICT (id_number) DO UPDATE SET
+                    row_index = excluded.row_index,
+                    name = excluded.name,
+                    arrivals = CASE WHEN arrivals = '' THEN excluded.arrivals ELSE arrivals END
+                """,
+                attendees
+            )
+            conn.execute(
+                "DELETE FROM attendees WHERE id_number NOT IN (SELECT value FROM json_each(?))",
+                (json.dumps([attendee[0] for attendee in attendees]),)
+            )
+
+    def count_attendees(self) -> int:
+        """Number of people currently on the local roster."""
+        return self._connection().execute("SELECT COUNT(*) FROM attendees").fetchone()[0]
+
+    def find_attendee(self, id_number: str) -> tuple:
+        """
+        Return (row_index, name) for id_number.
+        Returns (None, None) if not found.
+        """
+        row = self._connection().execute(
+            "SELECT row_index, name FROM attendees WHERE id_number = ?", (id_number,)
+        ).fetchone()
+        return row if row else (None, None)
+
+    def record_arrival(self, id_number: str, timestamp: str, shift: str) -> str:
+        """
+        Append timestamp to the person's arrivals and queue it for Sheets.
+        Returns the updated comma-separated arrivals.
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                UPDATE attendees
+                SET arrivals = CASE WHEN arrivals = '' THEN ? ELSE arrivals || ', ' || ? END
+                WHERE id_number = ?
+                """,
+                (timestamp, timestamp, id_number)
+            )
+            conn.execute(
+                "INSERT INTO outbox (id_number, timestamp, shift) VALUES (?, ?, ?)",
+                (id_number, timestamp, shift)
+            )
+            row = conn.execute(
+                "SELECT arrivals FROM attendees WHERE id_number = ?", (id_number,)
+            ).fetchone()
+        return row[0] if row else timestamp
+
+    def claim_outbox(self, limit: int) -> list[tuple[int, list[str]]]:
+        """
+        Claim up to limit unsent arrivals so no other worker sends them.
+        Returns (outbox_id, [id_number, timestamp, shift]) pairs in insertion order.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE outbox SET claimed_at = NULL WHERE claimed_at < ?",
+                (now - OUTBOX_CLAIM_TIMEOUT_SECONDS,)
+            )
+            rows = conn.execute(
+                """
+                SELECT id, id_number, timestamp, shift FROM outbox
+                WHERE claimed_at IS NULL ORDER BY id LIMIT ?
+                """,
+                (limit,)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE outbox SET claimed_at = ? WHERE id = ?",
+                [(now, row[0]) for row in rows]
+            )
+        return [(row[0], [row[1], row[2], row[3]]) for row in rows]
+
+    def complete_outbox(self, outbox_ids: list[int]) -> None:
+        """Delete arrivals that were written to Sheets."""
+        with self._transaction() as conn:
+            conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in outbox_ids])
+
+    def release_outbox(self, outbox_ids: list[int]) -> None:
+        """Return claimed arrivals to the outbox after a failed write."""
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE outbox SET claimed_at = NULL WHERE id = ?", [(i,) for i in outbox_ids]
+            )
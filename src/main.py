@@ -1,5 +1,6 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request
 import logging
+import orjson
 from connectors.gsheets_client import AttendanceManager
 
 # Configure logging
@@ -9,6 +10,12 @@ logger = logging.getLogger(__name__)
 # Initialize Flask app
 app = Flask(__name__)
 
+
+def ojsonify(obj, status=200):
+    """Serialize obj with orjson into a JSON response."""
+    return app.response_class(orjson.dumps(obj), status=status, mimetype="application/json")
+
+
 # Initialize AttendanceManager
 try:
     attendance_manager = AttendanceManager()
@@ -32,47 +39,48 @@ def register_arrival():
     """
     try:
         if not attendance_manager:
-            return jsonify({
+            return ojsonify({
                 "success": False,
                 "message": "Sistema no disponible. Contacte al administrador."
-            }), 503
+            }, 503)
 
-        # Get id_number from request
-        data = request.get_json()
+        # Get id_number from request; malformed or non-object bodies are a 400
+        data = request.get_json(silent=True)
+        id_number = data.get('id_number') if isinstance(data, dict) else None
         
-        if not data or 'id_number' not in data:
-            return jsonify({
+        if id_number is None:
+            return ojsonify({
                 "success": False,
                 "message": "Debe proporcionar un número de identificación"
-            }), 400
+            }, 400)
         
-        id_number = str(data['id_number']).strip()
+        id_number = str(id_number).strip()
         
         if not id_number:
-            return jsonify({
+            return ojsonify({
                 "success": False,
                 "message": "El número de identificación no puede estar vacío"
-            }), 400
+            }, 400)
         
         # Register arrival
         result = attendance_manager.register_arrival(id_number)
         
         # Return result with appropriate status code
         status_code = 200 if result['success'] else 404
-        return jsonify(result), status_code
+        return ojsonify(result, status_code)
         
     except Exception as e:
         logger.error(f"Error in register_arrival endpoint: {e}")
-        return jsonify({
+        return ojsonify({
             "success": False,
             "message": f"Error interno del servidor: {str(e)}"
-        }), 500
+        }, 500)
 
 
 @app.route('/health')
 def health():
     """Health check endpoint."""
-    return jsonify({
+    return ojsonify({
         "status": "healthy",
         "attendance_manager": "connected" if attendance_manager else "disconnected"
     })
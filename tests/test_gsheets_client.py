@@ -0,0 +1,145 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import gspread
+
+from connectors import gsheets_client
+from connectors.gsheets_client import AttendanceManager
+from connectors.sqlite_store import AttendanceStore
+
+
+class ManagerTestCase(unittest.TestCase):
+    def make_client(self) -> mock.Mock:
+        """Return the mocked gspread client handed to the manager."""
+        raise NotImplementedError
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmpdir.name, "attendance.db")
+        creds_path = os.path.join(self._tmpdir.name, "creds.json")
+        open(creds_path, "w").close()
+
+        env = mock.patch.dict(os.environ, {
+            "GOOGLE_SHEETS_CREDENTIALS_PATH": creds_path,
+            "GOOGLE_SHEETS_ID": "sheet-id",
+            "ATTENDANCE_DB_PATH": self.db_path
+        })
+        env.start()
+        self.addCleanup(env.stop)
+
+        for target, value in [
+            ("_get_client", mock.Mock(return_value=self.make_client())),
+            ("load_dotenv", mock.Mock()),
+            ("atexit", mock.Mock())
+        ]:
+            patcher = mock.patch.object(gsheets_client, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.addCleanup(self._tmpdir.cleanup)
+
+
+class OfflineStartupTest(ManagerTestCase):
+    def make_client(self):
+        # Sheets is down: opening the spreadsheet always fails
+        client = mock.Mock()
+        client.open_by_key.side_effect = ConnectionError("network unreachable")
+        return client
+
+    def test_checks_in_from_local_roster_when_sheets_is_down(self):
+        AttendanceStore(self.db_path).replace_roster([("1", 2, "Ana", "")])
+
+        manager = AttendanceManager()
+        result = manager.register_arrival("1")
+
+        self.assertTrue(result["success"])
+        self.assertEqual(result["name"], "Ana")
+        self.assertEqual(len(AttendanceStore(self.db_path).claim_outbox(10)), 1)
+
+    def test_flush_keeps_rows_while_sheets_is_down(self):
+        AttendanceStore(self.db_path).replace_roster([("1", 2, "Ana", "")])
+
+        manager = AttendanceManager()
+        manager.register_arrival("1")
+
+        self.assertFalse(manager.flush())
+        self.assertEqual(len(AttendanceStore(self.db_path).claim_outbox(10)), 1)
+
+    def test_startup_fails_without_local_roster(self):
+        with self.assertRaises(ConnectionError):
+            AttendanceManager()
+
+
+class RosterSyncTest(ManagerTestCase):
+    values = [
+        ["id_number", "name", "email", "phone", "arrival_time"],
+        ["1", "Ana", "", "", "2025-01-01 08:00:00"],
+        ["", "Sin documento", "x@example.com"],
+        ["", "Otra fila"],
+        [],
+        ["1", "Ana duplicada"],
+        [" 2 ", "Bruno"]
+    ]
+
+    def make_client(self):
+        client = mock.Mock()
+        client.open_by_key.return_value.values_get.return_value = {"values": self.values}
+        return client
+
+    def test_skips_blank_ids_and_keeps_first_duplicate(self):
+        with self.assertLogs(gsheets_client.logger, "WARNING") as logs:
+            AttendanceManager()
+
+        store = AttendanceStore(self.db_path)
+        self.assertEqual(store.count_attendees(), 2)
+        self.assertEqual(store.find_attendee("1"), (2, "Ana"))
+        self.assertEqual(store.find_attendee("2"), (7, "Bruno"))
+        self.assertEqual(store.find_attendee(""), (None, None))
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("Duplicate id_number 1 at row 6", logs.output[0])
+
+
+def api_error(status_code: int) -> gspread.exceptions.APIError:
+    """Build a gspread APIError for a response with the given status."""
+    response = mock.Mock(status_code=status_code)
+    response.json.return_value = {
+        "error": {"code": status_code, "message": "error", "status": "ERROR"}
+    }
+    return gspread.exceptions.APIError(response)
+
+
+class LogWorksheetTest(ManagerTestCase):
+    def make_client(self):
+        self.log_worksheet = mock.Mock()
+        self.sheet = mock.Mock()
+        self.sheet.values_get.return_value = {"values": [["id_number", "name"], ["1", "Ana"]]}
+        client = mock.Mock()
+        client.open_by_key.return_value = self.sheet
+        return client
+
+    def test_reopens_when_another_worker_created_it(self):
+        self.sheet.worksheet.side_effect = [
+            mock.Mock(), gspread.exceptions.WorksheetNotFound(), self.log_worksheet
+        ]
+        self.sheet.add_worksheet.side_effect = api_error(400)
+
+        manager = AttendanceManager()
+
+        self.assertIs(manager.log_worksheet, self.log_worksheet)
+
+    def test_other_api_errors_are_not_masked(self):
+        manager = AttendanceManager()
+        self.sheet.worksheet.side_effect = gspread.exceptions.WorksheetNotFound()
+        self.sheet.add_worksheet.side_effect = api_error(403)
+
+        with self.assertRaises(gspread.exceptions.APIError) as raised:
+            manager._open_log_worksheet()
+
+        self.assertEqual(raised.exception.response.status_code, 403)
+        self.assertEqual(self.sheet.worksheet.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from connectors import sqlite_store
+from connectors.sqlite_store import AttendanceStore
+
+
+class AttendanceStoreTest(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.store = AttendanceStore(os.path.join(self._tmpdir.name, "attendance.db"))
+        self.store.replace_roster([
+            ("1", 2, "Ana", ""),
+            ("2", 3, "Bruno", "2025-01-01 08:00:00"),
+        ])
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_find_attendee(self):
+        self.assertEqual(self.store.find_attendee("1"), (2, "Ana"))
+        self.assertEqual(self.store.find_attendee("9"), (None, None))
+
+    def test_record_arrival_appends_to_sheet_history(self):
+        self.assertEqual(self.store.record_arrival("1", "t1", "Jornada Mañana"), "t1")
+        self.assertEqual(
+            self.store.record_arrival("2", "t2", "Jornada Tarde"),
+            "2025-01-01 08:00:00, t2"
+        )
+
+    def test_replace_roster_keeps_local_arrivals(self):
+        self.store.record_arrival("1", "t1", "Jornada Mañana")
+        self.store.replace_roster([("1", 5, "Ana María", "stale")])
+
+        self.assertEqual(self.store.find_attendee("1"), (5, "Ana María"))
+        self.assertEqual(self.store.record_arrival("1", "t2", "Jornada Tarde"), "t1, t2")
+
+    def test_replace_roster_drops_missing_ids(self):
+        self.store.replace_roster([("1", 2, "Ana", "")])
+
+        self.assertEqual(self.store.find_attendee("2"), (None, None))
+        self.assertEqual(self.store.count_attendees(), 1)
+
+    def test_claimed_rows_are_not_claimed_twice(self):
+        self.store.record_arrival("1", "t1", "Jornada Mañana")
+        self.store.record_arrival("2", "t2", "Jornada Mañana")
+
+        first = self.store.claim_outbox(10)
+        self.assertEqual([row for _, row in first], [
+            ["1", "t1", "Jornada Mañana"],
+            ["2", "t2", "Jornada Mañana"],
+        ])
+        self.assertEqual(self.store.claim_outbox(10), [])
+
+    def test_released_rows_are_reclaimed(self):
+        self.store.record_arrival("1", "t1", "Jornada Mañana")
+        claimed = self.store.claim_outbox(10)
+
+        self.store.release_outbox([outbox_id for outbox_id, _ in claimed])
+        self.assertEqual(self.store.claim_outbox(10), claimed)
+
+    def test_completed_rows_are_removed(self):
+        self.store.record_arrival("1", "t1", "Jornada Mañana")
+        claimed = self.store.claim_outbox(10)
+
+        self.store.complete_outbox([outbox_id for outbox_id, _ in claimed])
+        self.store.release_outbox([outbox_id for outbox_id, _ in claimed])
+        self.assertEqual(self.store.claim_outbox(10), [])
+
+    def test_stale_claims_are_reclaimed(self):
+        self.store.record_arrival("1", "t1", "Jornada Mañana")
+        now = 1_000_000.0
+
+        with mock.patch.object(sqlite_store.time, "time", return_value=now):
+            claimed = self.store.claim_outbox(10)
+
+        later = now + sqlite_store.OUTBOX_CLAIM_TIMEOUT_SECONDS - 1
+        with mock.patch.object(sqlite_store.time, "time", return_value=later):
+            self.assertEqual(self.store.claim_outbox(10), [])
+
+        expired = now + sqlite_store.OUTBOX_CLAIM_TIMEOUT_SECONDS + 1
+        with mock.patch.object(sqlite_store.time, "time", return_value=expired):
+            self.assertEqual(self.store.claim_outbox(10), claimed)
+
+    def test_claim_respects_limit(self):
+        for i in range(3):
+            self.store.record_arrival("1", f"t{i}", "Jornada Mañana")
+
+        self.assertEqual(len(self.store.claim_outbox(2)), 2)
+        self.assertEqual(len(self.store.claim_outbox(2)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import json
+import os
+import stat
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from connectors.gsheets_client import (
+    TOKEN_EXPIRY_MARGIN,
+    _read_cached_token,
+    _write_cached_token
+)
+
+SCOPES = ["https://www.googleapis.com/auth/drive", "https://spreadsheets.google.com/feeds"]
+
+
+def make_credentials(expires_in: timedelta, email="bot@project.iam.gserviceaccount.com",
+                     scopes=SCOPES):
+    """Stand-in for service account credentials with a naive UTC expiry."""
+    expiry = (datetime.now(timezone.utc) + expires_in).replace(tzinfo=None, microsecond=0)
+    return SimpleNamespace(
+        token="ya29.token",
+        expiry=expiry,
+        service_account_email=email,
+        scopes=scopes
+    )
+
+
+class TokenCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmpdir.cleanup)
+        self.path = os.path.join(self._tmpdir.name, "gsheets_token.json")
+
+    def test_round_trip(self):
+        credentials = make_credentials(timedelta(hours=1))
+        _write_cached_token(self.path, credentials)
+
+        self.assertEqual(
+            _read_cached_token(self.path, credentials),
+            (credentials.token, credentials.expiry)
+        )
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+    def test_token_expiring_within_margin_is_a_miss(self):
+        credentials = make_credentials(TOKEN_EXPIRY_MARGIN - timedelta(seconds=30))
+        _write_cached_token(self.path, credentials)
+
+        self.assertIsNone(_read_cached_token(self.path, credentials))
+
+    def test_other_service_account_is_a_miss(self):
+        _write_cached_token(self.path, make_credentials(timedelta(hours=1)))
+        other = make_credentials(timedelta(hours=1), email="other@project.iam.gserviceaccount.com")
+
+        self.assertIsNone(_read_cached_token(self.path, other))
+
+    def test_other_scopes_are_a_miss(self):
+        _write_cached_token(self.path, make_credentials(timedelta(hours=1)))
+        other = make_credentials(timedelta(hours=1), scopes=SCOPES[:1])
+
+        self.assertIsNone(_read_cached_token(self.path, other))
+
+    def test_scope_order_does_not_matter(self):
+        _write_cached_token(self.path, make_credentials(timedelta(hours=1)))
+        reordered = make_credentials(timedelta(hours=1), scopes=list(reversed(SCOPES)))
+
+        self.assertIsNotNone(_read_cached_token(self.path, reordered))
+
+    def test_old_format_is_a_miss(self):
+        credentials = make_credentials(timedelta(hours=1))
+        exp = credentials.expiry.replace(tzinfo=timezone.utc).timestamp()
+        with open(self.path, "w") as f:
+            json.dump({"token": credentials.token, "exp": exp}, f)
+
+        self.assertIsNone(_read_cached_token(self.path, credentials))
+
+    def test_missing_or_corrupt_file_is_a_miss(self):
+        credentials = make_credentials(timedelta(hours=1))
+        self.assertIsNone(_read_cached_token(self.path, credentials))
+
+        with open(self.path, "w") as f:
+            f.write("{not json")
+        self.assertIsNone(_read_cached_token(self.path, credentials))
+
+    def test_write_does_not_follow_planted_temp_symlink(self):
+        target = os.path.join(self._tmpdir.name, "victim")
+        with open(target, "w") as f:
+            f.write("untouched")
+        os.symlink(target, f"{self.path}.{os.getpid()}.tmp")
+
+        _write_cached_token(self.path, make_credentials(timedelta(hours=1)))
+
+        with open(target) as f:
+            self.assertEqual(f.read(), "untouched")
+        self.assertFalse(os.path.islink(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()